@@ -3,10 +3,24 @@ import cv2
 import os
 from pathlib import Path
 import numpy as np
+from train import find_latest_weights
+from yolo_labels import empty_labels, make_labels, read_labels, write_labels, xyxy_to_xywhn
 
-def generate_labels_from_model(model_path, images_dir, labels_dir, conf_threshold=0.05):
+def same_labels(a, b, tol=0.005):
+    """True if two label arrays hold the same boxes up to tol (normalized units)"""
+    return a.shape == b.shape and np.allclose(a, b, atol=tol)
+
+def generate_labels_from_model(model_path, images_dir, labels_dir, conf_threshold=0.05, only=None,
+                               uncertain_conf=0.5, skip_unchanged=False):
     """
     Generate YOLO format labels using existing trained model predictions
+    
+    only: optional set of image stems to (re)label, all images otherwise.
+    skip_unchanged: leave existing label files alone when the new
+    predictions match them.
+    Returns {stem: fraction of boxes below uncertain_conf} so callers can
+    tell which pseudo-labels are likely to change with a better model
+    (0.0 when nothing was detected: nothing even reached conf_threshold).
     """
     model = YOLO(model_path)
     
@@ -16,11 +30,15 @@ def generate_labels_from_model(model_path, images_dir, labels_dir, conf_threshol
     image_files = []
     for ext in ['*.jpg', '*.jpeg', '*.png', '*.bmp']:
         image_files.extend(Path(images_dir).glob(ext))
+    if only is not None:
+        image_files = [p for p in image_files if p.stem in only]
     
     print(f"Found {len(image_files)} images to process")
     
     generated_count = 0
     detection_count = 0
+    unchanged_count = 0
+    uncertainty = {}
     
     for img_path in image_files:
         print(f"Processing: {img_path.name}")
@@ -39,37 +57,37 @@ def generate_labels_from_model(model_path, images_dir, labels_dir, conf_threshol
         # Create label file path
         label_path = Path(labels_dir) / f"{img_path.stem}.txt"
         
-        # Write labels
-        with open(label_path, 'w') as f:
-            if results[0].boxes is not None:
-                for box in results[0].boxes:
-                    # Get bounding box coordinates (normalized)
-                    x1, y1, x2, y2 = box.xyxy[0].tolist()
-                    
-                    # Convert to YOLO format (center_x, center_y, width, height)
-                    center_x = (x1 + x2) / 2 / width
-                    center_y = (y1 + y2) / 2 / height
-                    bbox_width = (x2 - x1) / width
-                    bbox_height = (y2 - y1) / height
-                    
-                    # Class ID (0 for fish)
-                    class_id = 0
-                    confidence = box.conf[0].item()
-                    
-                    # Write YOLO format: class_id center_x center_y width height
-                    f.write(f"{class_id} {center_x:.6f} {center_y:.6f} {bbox_width:.6f} {bbox_height:.6f}\n")
-                    detection_count += 1
-                    
-                print(f"  Generated {len(results[0].boxes) if results[0].boxes is not None else 0} labels")
-            else:
-                print(f"  No detections found")
+        # Convert all boxes at once to YOLO format (class 0 = fish)
+        boxes = results[0].boxes
+        if boxes is not None and len(boxes):
+            labels = make_labels(xyxy_to_xywhn(boxes.xyxy.cpu().numpy(), width, height))
+        else:
+            labels = empty_labels()
+        if skip_unchanged and label_path.exists() and same_labels(labels, read_labels(label_path)):
+            unchanged_count += 1
+        else:
+            write_labels(label_path, labels)
+        detection_count += len(labels)
+        
+        if len(labels):
+            uncertainty[img_path.stem] = float((boxes.conf.cpu().numpy() < uncertain_conf).mean())
+        else:
+            uncertainty[img_path.stem] = 0.0
+        
+        if len(labels):
+            print(f"  Generated {len(labels)} labels")
+        else:
+            print(f"  No detections found")
                 
         generated_count += 1
     
     print(f"\nSummary:")
     print(f"- Processed {generated_count} images")
     print(f"- Generated {detection_count} total detections")
+    if skip_unchanged:
+        print(f"- Left {unchanged_count} unchanged label files as they were")
     print(f"- Labels saved to: {labels_dir}")
+    return uncertainty
 
 def create_empty_labels_for_missing():
     """
@@ -98,22 +116,18 @@ if __name__ == "__main__":
     print("Creating empty label files for missing labels...")
     create_empty_labels_for_missing()
     
-    # Check if trained model exists
-    model_path = "runs/detect/train10/weights/best.pt"
-    if not os.path.exists(model_path):
-        print(f"Warning: Model not found at {model_path}")
-        print("Available models:")
-        for run_dir in Path("runs/detect").glob("train*"):
-            weights_path = run_dir / "weights" / "best.pt"
-            if weights_path.exists():
-                print(f"  - {weights_path}")
+    # Use the newest trained model
+    model_path = find_latest_weights()
+    if model_path is None:
+        print("Warning: No trained model found in runs/detect")
+        print("Train one first with train.py")
         exit(1)
     
     print(f"\nUsing model: {model_path}")
     
     # Generate labels for training images
     print("\nGenerating labels for training images...")
-    generate_labels_from_model(
+    train_uncertainty = generate_labels_from_model(
         model_path=model_path,
         images_dir="data/images/train",
         labels_dir="data/labels/train",
@@ -122,12 +136,19 @@ if __name__ == "__main__":
     
     # Generate labels for validation images  
     print("\nGenerating labels for validation images...")
-    generate_labels_from_model(
+    val_uncertainty = generate_labels_from_model(
         model_path=model_path,
         images_dir="data/images/val", 
         labels_dir="data/labels/val",
         conf_threshold=0.05
     )
     
+    # Record the pseudo-labels so incremental.py can refresh them later
+    from incremental import load_state, record_auto_labels, save_state
+    state = load_state()
+    record_auto_labels(state, 'train', train_uncertainty)
+    record_auto_labels(state, 'val', val_uncertainty)
+    save_state(state)
+    
     print("\nDone! Please review the generated labels and manually correct any errors.")
     print("You can use the label_viewer.py script to review the labels visually.")
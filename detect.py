@@ -1,11 +1,50 @@
 import argparse
 import os
 import cv2
+import numpy as np
 from ultralytics import YOLO
-
-def detect(video_paths, conf_threshold=0.1, weights_path='runs/detect/train17/weights/best.pt', output_dir='outputs'):
+from detection_store import DEFAULT_DB, DetectionStore
+from roi import ROI, load_roi_config
+from train import find_latest_weights
+from video_writer import CODECS, AsyncVideoWriter, FrameSelector, output_path_for
+
+def annotate_roi_frame(display_frame, roi, boxes, confs, frame_width, frame_height):
+    """Draw the ROI outline and kept detections (frame pixels) on the 640x640 output"""
+    annotated = display_frame.copy()
+    scale = np.array([display_frame.shape[1] / frame_width, display_frame.shape[0] / frame_height], dtype=np.float32)
+
+    if roi.polygons:
+        outlines = [np.round(p * scale).astype(np.int32) for p in roi.polygons]
+        cv2.polylines(annotated, outlines, True, (255, 255, 0), 1)
+    else:
+        x1, y1 = np.round(np.array([roi.x1, roi.y1]) * scale).astype(int)
+        x2, y2 = np.round(np.array([roi.x2, roi.y2]) * scale).astype(int)
+        cv2.rectangle(annotated, (int(x1), int(y1)), (int(x2), int(y2)), (255, 255, 0), 1)
+
+    for (x1, y1, x2, y2), conf in zip((boxes * np.tile(scale, 2)).astype(int).tolist(), confs.tolist()):
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(annotated, f"fish {conf:.2f}", (x1, max(y1 - 5, 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
+    return annotated
+
+def detect(video_paths, conf_threshold=0.1, weights_path=None, output_dir='outputs',
+           codec='mp4v', quality=None, output_mode='all', diff_threshold=2.0, roi_config=None,
+           db_path=DEFAULT_DB, track=False):
+    weights_path = weights_path or find_latest_weights()
+    if weights_path is None:
+        print("❌ No trained model found in runs/detect, pass --weights")
+        return
+    print(f"Using weights: {weights_path}")
     model = YOLO(weights_path).to('cpu')
     os.makedirs(output_dir, exist_ok=True)
+    roi_config = load_roi_config(roi_config) if roi_config else {}
+    store = DetectionStore(db_path)
+    tracker_model = None
+
+    def run_model(image):
+        if tracker_model is not None:
+            return tracker_model.track(image, conf=conf_threshold, persist=True)
+        return model(image, conf=conf_threshold)
 
     print(f"\n🔍 Testing model with confidence threshold: {conf_threshold}")
 
@@ -33,8 +72,25 @@ def detect(video_paths, conf_threshold=0.1, weights_path='runs/detect/train17/we
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-        output_path = os.path.join(output_dir, os.path.basename(video_path).replace('.mp4', '_output.mp4'))
-        out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (640, 640))
+        suffix = '_highlights' if output_mode == 'detections' else '_output'
+        output_path = output_path_for(video_path, output_dir, codec, suffix)
+        out = AsyncVideoWriter(output_path, fps, (640, 640), codec=codec, quality=quality)
+        selector = FrameSelector(output_mode, fps, diff_threshold)
+
+        store.start_video(video_path, fps, width, height, weights_path, conf_threshold)
+        if track:
+            # Separate model per video: fresh tracker state, and the plain
+            # model (test frame) never touches the tracker
+            tracker_model = YOLO(weights_path).to('cpu')
+        # Model input is 640x640: source pixels per model pixel
+        frame_scale = np.array([width / 640, height / 640] * 2, dtype=np.float32)
+
+        roi = ROI.from_config(roi_config, video_path, width, height)
+        if roi is not None:
+            print(f"🎯 ROI crop {roi.size[0]}x{roi.size[1]} at ({roi.x1}, {roi.y1}), "
+                  f"{len(roi.polygons)} mask polygon(s)")
+            # Model input is 640x640: crop pixels per model pixel
+            crop_scale = np.array([roi.size[0] / 640, roi.size[1] / 640] * 2, dtype=np.float32)
 
         frame_count = 0
         detections_count = 0
@@ -48,29 +104,83 @@ def detect(video_paths, conf_threshold=0.1, weights_path='runs/detect/train17/we
             resized_frame = cv2.resize(frame, (640, 640))
             rgb_frame = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2RGB)
 
-            results = model(rgb_frame, conf=conf_threshold)
-            if results[0].boxes is not None:
-                detections_count += len(results[0].boxes)
-
-            annotated_frame = results[0].plot()
-            out.write(annotated_frame)
+            if roi is None:
+                results = run_model(rgb_frame)
+                boxes = results[0].boxes
+                render = results[0].plot
+            else:
+                # Only the ROI goes through the model, so fish get more input pixels
+                crop = cv2.resize(roi.crop(frame), (640, 640))
+                results = run_model(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+                boxes = results[0].boxes
+
+            if boxes is not None and len(boxes):
+                xyxy = boxes.xyxy.cpu().numpy()
+                confs = boxes.conf.cpu().numpy()
+                track_ids = boxes.id.cpu().numpy().astype(int) if boxes.id is not None else None
+            else:
+                xyxy, confs, track_ids = np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32), None
+
+            if roi is None:
+                xyxy = xyxy * frame_scale
+            else:
+                # Drop detections centered outside the mask, all at once
+                keep = roi.filter(xyxy * crop_scale)
+                xyxy, confs = roi.to_frame(xyxy[keep] * crop_scale), confs[keep]
+                track_ids = track_ids[keep] if track_ids is not None else None
+                render = lambda: annotate_roi_frame(resized_frame, roi, xyxy, confs, width, height)
+
+            frame_detections = len(xyxy)
+            store.add_frame(frame_count - 1, xyxy, confs, track_ids)
+            detections_count += frame_detections
+
+            # Encoding happens on the writer thread; rendering returns a new array
+            if selector.keep(resized_frame, frame_count - 1, frame_detections):
+                out.write(render())
 
             if frame_count % 30 == 0:
                 print(f"  ✅ Processed {frame_count}/{total_frames} frames — {detections_count} detections")
 
         cap.release()
         out.release()
+        store.finish_video(frame_count)
         print(f"✅ Done: {video_path}")
         print(f"📊 Total frames: {frame_count}, Total detections: {detections_count}")
         print(f"💾 Saved to: {output_path}")
 
+        if output_mode != 'all':
+            index_path = os.path.splitext(output_path)[0] + '_index.csv'
+            selector.save_index(index_path)
+            print(f"🕒 Frame/time index: {index_path}")
+
+        # Compared with encoding every frame on the main thread
+        per_frame = out.encode_time / max(out.frames_written, 1)
+        saved = out.encode_time + per_frame * selector.skipped - out.blocked_time
+        print(f"🎞️ Encoded {out.frames_written} frames ({selector.skipped} skipped) with {codec} in "
+              f"{out.encode_time:.1f}s on the writer thread, main thread waited {out.blocked_time:.1f}s "
+              f"— ~{saved:.1f}s saved")
+        print(f"🗄️ Detections stored in {db_path} (query with detection_store.py)")
+
+    store.close()
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Fish detection using YOLOv8')
-    parser.add_argument('--weights', type=str, default='runs/detect/train17/weights/best.pt', help='Path to model weights')
+    parser.add_argument('--weights', type=str, default=None, help='Path to model weights (default: newest runs/detect/*/weights/best.pt)')
     parser.add_argument('--input', type=str, nargs='*', help='List of video files to process (optional)')
     parser.add_argument('--input_dir', type=str, help='Folder containing .mp4 videos (optional)')
     parser.add_argument('--output_dir', type=str, default='outputs', help='Directory to save output videos')
     parser.add_argument('--conf', type=float, default=0.1, help='Confidence threshold for detection')
+    parser.add_argument('--codec', choices=sorted(CODECS), default='mp4v',
+                        help='Output codec: mjpg is fastest to encode, avc1 gives the smallest files')
+    parser.add_argument('--quality', type=float, default=None, help='Encoder quality 0-100 (honoured by mjpg)')
+    parser.add_argument('--output_mode', choices=['all', 'changed', 'detections'], default='all',
+                        help="'changed' skips near-identical frames, 'detections' writes a highlight reel")
+    parser.add_argument('--diff_threshold', type=float, default=2.0,
+                        help="Mean pixel difference (0-255) that counts as changed in 'changed' mode")
+    parser.add_argument('--roi_config', type=str, default=None,
+                        help='JSON file with per-video/per-camera ROI crops and polygons (see roi.py)')
+    parser.add_argument('--db', type=str, default=DEFAULT_DB, help='SQLite store for per-frame detections')
+    parser.add_argument('--track', action='store_true', help='Track fish across frames and store track summaries')
     args = parser.parse_args()
 
     video_files = []
@@ -85,4 +195,7 @@ if __name__ == '__main__':
         print("❗ Please provide either --input or --input_dir")
         exit(1)
 
-    detect(video_files, conf_threshold=args.conf, weights_path=args.weights, output_dir=args.output_dir)
+    detect(video_files, conf_threshold=args.conf, weights_path=args.weights, output_dir=args.output_dir,
+           codec=args.codec, quality=args.quality, output_mode=args.output_mode,
+           diff_threshold=args.diff_threshold, roi_config=args.roi_config,
+           db_path=args.db, track=args.track)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Per-video detection analytics store (SQLite) and query CLI
+
+detect.py writes every frame's detections here, so questions like fish per
+minute or max occupancy are answered from indexed tables instead of
+re-running inference or decoding the video.
+
+    python detection_store.py videos
+    python detection_store.py per-minute task1vid1
+    python detection_store.py frames task1vid1 --min 3 --t1 60 --t2 120
+    python detection_store.py max-occupancy task1vid1
+    python detection_store.py tracks task1vid1
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+DEFAULT_DB = 'outputs/detections.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    fps REAL, width INTEGER, height INTEGER, frames INTEGER,
+    weights TEXT, conf REAL, processed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS frames (
+    video_id INTEGER NOT NULL,
+    frame INTEGER NOT NULL,
+    t REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (video_id, frame)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS frames_time ON frames (video_id, t, count);
+CREATE INDEX IF NOT EXISTS frames_count ON frames (video_id, count);
+CREATE TABLE IF NOT EXISTS detections (
+    video_id INTEGER NOT NULL,
+    frame INTEGER NOT NULL,
+    t REAL NOT NULL,
+    x1 REAL, y1 REAL, x2 REAL, y2 REAL,
+    conf REAL,
+    track_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS detections_frame ON detections (video_id, frame);
+CREATE TABLE IF NOT EXISTS tracks (
+    video_id INTEGER NOT NULL,
+    track_id INTEGER NOT NULL,
+    first_frame INTEGER, last_frame INTEGER,
+    first_t REAL, last_t REAL,
+    detections INTEGER, mean_conf REAL,
+    PRIMARY KEY (video_id, track_id)
+) WITHOUT ROWID;
+"""
+
+class DetectionStore:
+    """Writes per-frame detections of processed videos into SQLite"""
+    def __init__(self, db_path=DEFAULT_DB, batch_size=500):
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(SCHEMA)
+        self.batch_size = batch_size
+        self.video_id = None
+        self._frames = []
+        self._detections = []
+
+    def start_video(self, video_path, fps, width, height, weights=None, conf=None):
+        """Register a video; re-processing a video replaces its old rows"""
+        path = os.path.abspath(video_path)
+        with self.conn:
+            row = self.conn.execute("SELECT id FROM videos WHERE path = ?", (path,)).fetchone()
+            if row:
+                for table in ('frames', 'detections', 'tracks'):
+                    self.conn.execute(f"DELETE FROM {table} WHERE video_id = ?", (row[0],))
+                self.conn.execute("DELETE FROM videos WHERE id = ?", (row[0],))
+            cursor = self.conn.execute(
+                "INSERT INTO videos (name, path, fps, width, height, weights, conf, processed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (os.path.splitext(os.path.basename(video_path))[0], path, fps, width, height,
+                 weights, conf, datetime.now().isoformat(timespec='seconds')))
+        self.video_id = cursor.lastrowid
+        self.fps = fps or 30.0
+
+    def add_frame(self, frame_idx, boxes, confs, track_ids=None):
+        """Buffer one frame: (N, 4) xyxy boxes in source-frame pixels, (N,) confidences"""
+        t = frame_idx / self.fps
+        self._frames.append((self.video_id, frame_idx, t, len(boxes)))
+        track_ids = track_ids if track_ids is not None else [None] * len(boxes)
+        for (x1, y1, x2, y2), conf, track_id in zip(boxes.tolist(), confs.tolist(), track_ids):
+            self._detections.append((self.video_id, frame_idx, t, x1, y1, x2, y2, conf,
+                                     None if track_id is None else int(track_id)))
+        if len(self._frames) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        with self.conn:
+            self.conn.executemany("INSERT INTO frames VALUES (?, ?, ?, ?)", self._frames)
+            self.conn.executemany("INSERT INTO detections VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", self._detections)
+        self._frames = []
+        self._detections = []
+
+    def finish_video(self, frame_count):
+        """Flush the remaining frames and build the track summaries"""
+        self.flush()
+        with self.conn:
+            self.conn.execute("UPDATE videos SET frames = ? WHERE id = ?", (frame_count, self.video_id))
+            self.conn.execute(
+                "INSERT INTO tracks SELECT video_id, track_id, MIN(frame), MAX(frame), MIN(t), MAX(t), "
+                "COUNT(*), AVG(conf) FROM detections "
+                "WHERE video_id = ? AND track_id IS NOT NULL GROUP BY track_id", (self.video_id,))
+
+    def close(self):
+        self.conn.close()
+
+def find_video(conn, video):
+    """Video id by name or path"""
+    row = conn.execute("SELECT id, fps FROM videos WHERE name = ? OR path = ? ORDER BY id DESC LIMIT 1",
+                       (video, os.path.abspath(video))).fetchone()
+    if row is None:
+        # Also accept e.g. 'task1vid1.mp4'
+        row = conn.execute("SELECT id, fps FROM videos WHERE name = ? ORDER BY id DESC LIMIT 1",
+                           (os.path.splitext(os.path.basename(video))[0],)).fetchone()
+    if row is None:
+        raise SystemExit(f"❌ Video not found in store: {video}")
+    return row
+
+def format_time(seconds):
+    return f"{int(seconds // 60):02d}:{seconds % 60:05.2f}"
+
+def print_rows(columns, rows):
+    widths = [max(len(c), *(len(str(r[i])) for r in rows)) if rows else len(c) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    print("  ".join('-' * w for w in widths))
+    for r in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(r, widths)))
+
+def query_videos(conn, args):
+    rows = conn.execute("SELECT name, frames, ROUND(frames / fps, 1), width || 'x' || height, processed_at "
+                        "FROM videos ORDER BY processed_at").fetchall()
+    print_rows(['video', 'frames', 'seconds', 'size', 'processed_at'], rows)
+
+def query_per_minute(conn, args):
+    video_id, _ = find_video(conn, args.video)
+    rows = conn.execute(
+        "SELECT CAST(t / 60 AS INTEGER) AS minute, ROUND(AVG(count), 2), MAX(count), COUNT(*) "
+        "FROM frames WHERE video_id = ? GROUP BY minute ORDER BY minute", (video_id,)).fetchall()
+    print_rows(['minute', 'mean_fish', 'max_fish', 'frames'], rows)
+
+def query_frames(conn, args):
+    video_id, _ = find_video(conn, args.video)
+    t2 = args.t2 if args.t2 is not None else float('inf')
+    rows = conn.execute(
+        "SELECT frame, t, count FROM frames WHERE video_id = ? AND t >= ? AND t <= ? AND count >= ? "
+        "ORDER BY frame", (video_id, args.t1, t2, args.min)).fetchall()
+    print_rows(['frame', 'time', 'fish'], [(f, format_time(t), c) for f, t, c in rows[:args.limit]])
+    if len(rows) > args.limit:
+        print(f"... {len(rows) - args.limit} more (use --limit)")
+    print(f"{len(rows)} frames with >= {args.min} fish")
+
+def query_max_occupancy(conn, args):
+    video_id, _ = find_video(conn, args.video)
+    row = conn.execute("SELECT MAX(count) FROM frames WHERE video_id = ?", (video_id,)).fetchone()
+    max_count = row[0] or 0
+    frames = conn.execute("SELECT frame, t FROM frames WHERE video_id = ? AND count = ? ORDER BY frame",
+                          (video_id, max_count)).fetchall()
+    print(f"Max occupancy: {max_count} fish in {len(frames)} frames")
+    if frames:
+        print(f"First at frame {frames[0][0]} ({format_time(frames[0][1])})")
+
+def query_tracks(conn, args):
+    video_id, _ = find_video(conn, args.video)
+    rows = conn.execute(
+        "SELECT track_id, first_frame, last_frame, ROUND(last_t - first_t, 2), detections, ROUND(mean_conf, 3) "
+        "FROM tracks WHERE video_id = ? ORDER BY first_frame", (video_id,)).fetchall()
+    if not rows:
+        print("No tracks stored (run detect.py with --track)")
+        return
+    print_rows(['track', 'first_frame', 'last_frame', 'seconds', 'detections', 'mean_conf'], rows)
+
+QUERIES = {
+    'videos': query_videos,
+    'per-minute': query_per_minute,
+    'frames': query_frames,
+    'max-occupancy': query_max_occupancy,
+    'tracks': query_tracks,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query stored fish detections')
+    parser.add_argument('query', choices=sorted(QUERIES), help='Query to run')
+    parser.add_argument('video', nargs='?', help='Video name or path (not needed for "videos")')
+    parser.add_argument('--db', type=str, default=DEFAULT_DB, help='Detection store path')
+    parser.add_argument('--min', type=int, default=1, help='frames: minimum fish per frame')
+    parser.add_argument('--t1', type=float, default=0.0, help='frames: start time in seconds')
+    parser.add_argument('--t2', type=float, default=None, help='frames: end time in seconds')
+    parser.add_argument('--limit', type=int, default=50, help='frames: max rows to print')
+    args = parser.parse_args()
+
+    if args.query != 'videos' and not args.video:
+        parser.error(f"{args.query} needs a video")
+    if not os.path.exists(args.db):
+        raise SystemExit(f"❌ Detection store not found: {args.db} (run detect.py first)")
+
+    conn = sqlite3.connect(args.db)
+    start = time.perf_counter()
+    QUERIES[args.query](conn, args)
+    print(f"\n⏱️ {(time.perf_counter() - start) * 1000:.1f} ms")
+    conn.close()
@@ -0,0 +1,88 @@
+import cv2
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+class ImageCache:
+    """
+    Memory-bounded LRU cache of decoded images with background prefetch.
+
+    Cached arrays are shared between callers, so draw on a copy.
+    """
+    def __init__(self, max_bytes=512 * 1024 * 1024, prefetch=3, workers=2):
+        self.max_bytes = max_bytes
+        self.prefetch = prefetch
+
+        self._images = OrderedDict()  # path -> decoded image, oldest first
+        self._sizes = {}              # path -> (width, height), never evicted
+        self._pending = {}            # path -> Future of a running prefetch
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def _load(self, key):
+        """Decode an image from disk and store it"""
+        image = cv2.imread(key)
+        if image is None:
+            return None
+
+        with self._lock:
+            self._sizes[key] = (image.shape[1], image.shape[0])
+            if key not in self._images:
+                self._images[key] = image
+                self._bytes += image.nbytes
+                # Evict least recently used images, but always keep the newest
+                while self._bytes > self.max_bytes and len(self._images) > 1:
+                    _, evicted = self._images.popitem(last=False)
+                    self._bytes -= evicted.nbytes
+        return image
+
+    def _prefetch_one(self, key):
+        try:
+            return self._load(key)
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def get(self, path):
+        """Return the decoded image for path, or None if it can't be read"""
+        key = str(path)
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                return image
+            future = self._pending.get(key)
+
+        # Wait for an in-flight prefetch instead of decoding twice
+        if future is not None:
+            return future.result()
+        return self._load(key)
+
+    def get_size(self, path):
+        """Return (width, height) for path without decoding it again"""
+        key = str(path)
+        with self._lock:
+            size = self._sizes.get(key)
+        if size is not None:
+            return size
+
+        if self.get(key) is None:
+            return None
+        return self._sizes.get(key)
+
+    def prefetch_around(self, paths, idx):
+        """Decode the next/previous images around idx in the background"""
+        for offset in range(1, self.prefetch + 1):
+            for neighbour in (idx + offset, idx - offset):
+                if not 0 <= neighbour < len(paths):
+                    continue
+                key = str(paths[neighbour])
+                with self._lock:
+                    if key in self._images or key in self._pending:
+                        continue
+                    self._pending[key] = self._executor.submit(self._prefetch_one, key)
+
+    def close(self):
+        """Stop background prefetching"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Incremental pseudo-label retraining loop
+
+Fine-tunes the newest best.pt once enough labels changed since the last
+training, then refreshes only the pseudo-labels that are likely to change.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import train
+from auto_label import generate_labels_from_model
+
+SPLITS = {
+    'train': ('data/images/train', 'data/labels/train'),
+    'val': ('data/images/val', 'data/labels/val'),
+}
+STATE_PATH = Path('data/labels/incremental_state.json')
+EMPTY_HASH = hashlib.sha1(b'').hexdigest()
+IMAGE_EXTS = ['*.jpg', '*.jpeg', '*.png', '*.bmp']
+
+def load_state():
+    """
+    trained: {split/stem: label hash} as of the last training
+    auto: {split/stem: {'hash': label hash as written, 'uncertainty': 0-1}}
+          for pseudo-labels; a different hash now means a human edited it
+    """
+    if STATE_PATH.exists():
+        with open(STATE_PATH, 'r') as f:
+            return json.load(f)
+    return {'trained': {}, 'auto': {}}
+
+def save_state(state):
+    os.makedirs(STATE_PATH.parent, exist_ok=True)
+    with open(STATE_PATH, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+def label_hashes():
+    """Content hash of every label file, keyed split/stem"""
+    hashes = {}
+    for split, (_, labels_dir) in SPLITS.items():
+        for label_path in Path(labels_dir).glob('*.txt'):
+            hashes[f"{split}/{label_path.stem}"] = hashlib.sha1(label_path.read_bytes()).hexdigest()
+    return hashes
+
+def changed_labels(state, hashes=None):
+    """Labels added, edited or removed since the last training"""
+    hashes = label_hashes() if hashes is None else hashes
+    trained = state['trained']
+    return sorted(k for k in set(hashes) | set(trained) if hashes.get(k) != trained.get(k))
+
+def record_auto_labels(state, split, uncertainty):
+    """Remember freshly written pseudo-labels so later edits can be detected"""
+    _, labels_dir = SPLITS[split]
+    for stem, score in uncertainty.items():
+        label_path = Path(labels_dir) / f"{stem}.txt"
+        state['auto'][f"{split}/{stem}"] = {
+            'hash': hashlib.sha1(label_path.read_bytes()).hexdigest(),
+            'uncertainty': score,
+        }
+
+def relabel_candidates(state, split, hashes, min_uncertainty=0.2, include_empty=False):
+    """
+    Stems whose pseudo-labels are worth regenerating: images never
+    labeled, and unedited pseudo-labels where more than min_uncertainty of
+    the boxes were low-confidence. Empty pseudo-labels (most frames of a
+    fish video) are only re-checked with include_empty. Labels a human
+    touched (or that predate this tool) are never overwritten.
+    """
+    images_dir, _ = SPLITS[split]
+    stems = set()
+    for ext in IMAGE_EXTS:
+        stems.update(p.stem for p in Path(images_dir).glob(ext))
+
+    candidates = set()
+    for stem in stems:
+        key = f"{split}/{stem}"
+        auto = state['auto'].get(key)
+        if key not in hashes:
+            # A label file deleted after training/auto-labeling means "no fish"
+            if key not in state['trained'] and not auto:
+                candidates.add(stem)
+        elif auto and auto['hash'] == hashes[key]:
+            # Hash check also covers state written when empty scored 1.0
+            if hashes[key] == EMPTY_HASH:
+                if include_empty:
+                    candidates.add(stem)
+            elif auto['uncertainty'] > min_uncertainty:
+                candidates.add(stem)
+    return candidates
+
+def relabel(weights, state, conf_threshold=0.05, min_uncertainty=0.2, include_empty=False):
+    """Regenerate only the candidate pseudo-labels with the given weights"""
+    hashes = label_hashes()
+    total = 0
+    for split, (images_dir, labels_dir) in SPLITS.items():
+        candidates = relabel_candidates(state, split, hashes, min_uncertainty, include_empty)
+        if not candidates:
+            continue
+        print(f"\nRe-labeling {len(candidates)} {split} images...")
+        uncertainty = generate_labels_from_model(weights, images_dir, labels_dir, conf_threshold,
+                                                 only=candidates, skip_unchanged=True)
+        record_auto_labels(state, split, uncertainty)
+        # The model's own output is nothing new to train on: only human
+        # edits of these labels should count towards the next fine-tune
+        for stem in uncertainty:
+            key = f"{split}/{stem}"
+            state['trained'][key] = state['auto'][key]['hash']
+        total += len(uncertainty)
+    return total
+
+def run_iteration(min_changed=20, epochs=30, force=False, conf_threshold=0.05, min_uncertainty=0.2,
+                  include_empty=False):
+    """One loop iteration: fine-tune if enough labels changed, then re-label"""
+    state = load_state()
+    hashes = label_hashes()
+    changed = changed_labels(state, hashes)
+    weights = train.find_latest_weights()
+
+    print(f"Labels changed since last training: {len(changed)} (threshold {min_changed})")
+    print(f"Latest weights: {weights or 'none, starting from yolov8s.pt'}")
+
+    if len(changed) < min_changed and not force:
+        print("Not enough new labels yet, skipping training.")
+        return None
+
+    # Fine-tune from the newest model instead of retraining from scratch
+    save_dir = train.train(weights=weights or 'yolov8s.pt', epochs=epochs, patience=10)
+    new_weights = str(Path(save_dir) / 'weights' / 'best.pt')
+
+    # Snapshot taken before training: edits made meanwhile count next time
+    state['trained'] = hashes
+    save_state(state)
+
+    relabeled = relabel(new_weights, state, conf_threshold, min_uncertainty, include_empty)
+    save_state(state)
+
+    print(f"\nFine-tuned model: {new_weights}")
+    print(f"Re-labeled {relabeled} images, review them with label_viewer.py")
+    return new_weights
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Incremental fine-tune and pseudo-label refresh')
+    parser.add_argument('--min_changed', type=int, default=20, help='Changed labels needed before fine-tuning')
+    parser.add_argument('--epochs', type=int, default=30, help='Fine-tuning epochs')
+    parser.add_argument('--force', action='store_true', help='Fine-tune even below --min_changed')
+    parser.add_argument('--conf', type=float, default=0.05, help='Confidence threshold for pseudo-labels')
+    parser.add_argument('--min_uncertainty', type=float, default=0.2,
+                        help='Re-label unedited pseudo-labels only above this fraction of low-confidence boxes')
+    parser.add_argument('--include_empty', action='store_true',
+                        help='Also re-check unedited pseudo-labels with no detections (e.g. after a big model change)')
+    parser.add_argument('--status', action='store_true', help='Only show what the next iteration would do')
+    args = parser.parse_args()
+
+    if args.status:
+        state = load_state()
+        hashes = label_hashes()
+        print(f"Latest weights: {train.find_latest_weights()}")
+        print(f"Labels changed since last training: {len(changed_labels(state, hashes))}")
+        for split in SPLITS:
+            print(f"{split}: {len(relabel_candidates(state, split, hashes, args.min_uncertainty, args.include_empty))} images would be re-labeled")
+    else:
+        run_iteration(min_changed=args.min_changed, epochs=args.epochs, force=args.force,
+                      conf_threshold=args.conf, min_uncertainty=args.min_uncertainty,
+                      include_empty=args.include_empty)
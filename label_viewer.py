@@ -1,13 +1,68 @@
 import cv2
 import os
+import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import numpy as np
+from image_cache import ImageCache
+from yolo_labels import empty_labels, read_labels, read_split_labels, xywhn_to_xyxy
+
+# Longest side of each thumbnail pyramid level, largest first
+THUMBNAIL_SIZES = (512, 256, 128)
+
+# Review status colors for grid mode (BGR)
+STATUS_COLORS = {
+    "accepted": (0, 200, 0),
+    "deleted": (0, 0, 255),
+    "edit": (0, 165, 255),
+}
+
+def _build_thumbnail(img_path, thumbs_dir):
+    """Write every pyramid level for one image, skipping up-to-date ones"""
+    targets = [thumbs_dir / str(size) / f"{img_path.stem}.jpg" for size in THUMBNAIL_SIZES]
+    src_mtime = img_path.stat().st_mtime
+    if all(t.exists() and t.stat().st_mtime >= src_mtime for t in targets):
+        return False
+    
+    image = cv2.imread(str(img_path))
+    if image is None:
+        return False
+    
+    # Each level is downscaled from the previous one, not from the full image
+    level = image
+    for size, target in zip(THUMBNAIL_SIZES, targets):
+        scale = size / max(level.shape[:2])
+        if scale < 1.0:
+            new_size = (max(int(level.shape[1] * scale), 1), max(int(level.shape[0] * scale), 1))
+            level = cv2.resize(level, new_size, interpolation=cv2.INTER_AREA)
+        cv2.imwrite(str(target), level, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return True
+
+def build_thumbnails(image_files, thumbs_dir, workers=None):
+    """Build the on-disk thumbnail pyramid for all images in parallel"""
+    thumbs_dir = Path(thumbs_dir)
+    for size in THUMBNAIL_SIZES:
+        os.makedirs(thumbs_dir / str(size), exist_ok=True)
+    
+    # cv2 releases the GIL while decoding/encoding, so threads scale
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        built = sum(executor.map(lambda p: _build_thumbnail(p, thumbs_dir), image_files))
+    
+    if built:
+        print(f"Built thumbnails for {built} images in {thumbs_dir}")
+    return thumbs_dir
 
 class LabelViewer:
     def __init__(self, images_dir, labels_dir):
         self.images_dir = Path(images_dir)
         self.labels_dir = Path(labels_dir)
         self.current_idx = 0
+        self.cache = ImageCache()
+        
+        # Grid mode: data/thumbnails/<split>, data/labels/<split>_review.json
+        self.thumbs_dir = self.images_dir.parent.parent / "thumbnails" / self.images_dir.name
+        self.review_path = self.labels_dir.parent / f"{self.labels_dir.name}_review.json"
+        self.trash_dir = self.labels_dir.parent / f"{self.labels_dir.name}_trash"
         
         # Get list of images
         self.image_files = []
@@ -29,45 +84,24 @@ class LabelViewer:
         print("- 's': Show statistics")
         
     def load_labels(self, img_path):
-        """Load YOLO format labels for an image"""
+        """Load YOLO format labels for an image as an (N, 5) array"""
         label_path = self.labels_dir / f"{img_path.stem}.txt"
-        labels = []
         
-        if label_path.exists():
-            try:
-                with open(label_path, 'r') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line:
-                            parts = line.split()
-                            if len(parts) >= 5:
-                                class_id = int(parts[0])
-                                center_x = float(parts[1])
-                                center_y = float(parts[2])
-                                width = float(parts[3])
-                                height = float(parts[4])
-                                labels.append([class_id, center_x, center_y, width, height])
-            except Exception as e:
-                print(f"Error reading label file {label_path}: {e}")
-        
-        return labels
+        try:
+            return read_labels(label_path)
+        except Exception as e:
+            print(f"Error reading label file {label_path}: {e}")
+            return empty_labels()
     
     def draw_boxes(self, image, labels, img_width, img_height):
         """Draw bounding boxes on image"""
-        if not labels:
-            return image
-            
+        # Always copy: the image may be shared with the image cache
         image_copy = image.copy()
         
-        for label in labels:
-            class_id, center_x, center_y, width, height = label
-            
-            # Convert from YOLO format to pixel coordinates
-            x1 = int((center_x - width/2) * img_width)
-            y1 = int((center_y - height/2) * img_height)
-            x2 = int((center_x + width/2) * img_width)
-            y2 = int((center_y + height/2) * img_height)
-            
+        # Convert from YOLO format to pixel coordinates, all boxes at once
+        corners = xywhn_to_xyxy(labels[:, 1:], img_width, img_height).astype(int).tolist()
+        
+        for x1, y1, x2, y2 in corners:
             # Draw bounding box
             cv2.rectangle(image_copy, (x1, y1), (x2, y2), (0, 255, 0), 2)
             
@@ -87,18 +121,31 @@ class LabelViewer:
         else:
             print(f"No label file to delete for: {img_path.name}")
     
+    def trash_label_file(self, img_path):
+        """Move the label file to the trash folder so it can be restored"""
+        label_path = self.labels_dir / f"{img_path.stem}.txt"
+        if label_path.exists():
+            os.makedirs(self.trash_dir, exist_ok=True)
+            os.replace(label_path, self.trash_dir / label_path.name)
+            print(f"Moved label file to trash: {label_path}")
+        else:
+            print(f"No label file to delete for: {img_path.name}")
+    
+    def restore_label_file(self, img_path):
+        """Bring a trashed label file back"""
+        trash_path = self.trash_dir / f"{img_path.stem}.txt"
+        if trash_path.exists():
+            os.replace(trash_path, self.labels_dir / trash_path.name)
+            print(f"Restored label file: {self.labels_dir / trash_path.name}")
+    
     def show_statistics(self):
         """Show labeling statistics"""
         total_images = len(self.image_files)
-        labeled_count = 0
-        total_detections = 0
         
-        for img_path in self.image_files:
-            label_path = self.labels_dir / f"{img_path.stem}.txt"
-            if label_path.exists() and label_path.stat().st_size > 0:
-                labeled_count += 1
-                labels = self.load_labels(img_path)
-                total_detections += len(labels)
+        # One pass over the whole split instead of a file at a time
+        labels = read_split_labels(self.labels_dir, [p.stem for p in self.image_files])
+        labeled_count = sum(1 for l in labels.values() if len(l))
+        total_detections = sum(len(l) for l in labels.values())
         
         print(f"\nStatistics:")
         print(f"- Total images: {total_images}")
@@ -115,12 +162,13 @@ class LabelViewer:
         while self.current_idx < len(self.image_files):
             img_path = self.image_files[self.current_idx]
             
-            # Load image
-            image = cv2.imread(str(img_path))
+            # Load image (usually already prefetched)
+            image = self.cache.get(img_path)
             if image is None:
                 print(f"Could not load image: {img_path}")
                 self.current_idx += 1
                 continue
+            self.cache.prefetch_around(self.image_files, self.current_idx)
                 
             img_height, img_width = image.shape[:2]
             
@@ -165,6 +213,164 @@ class LabelViewer:
             elif key == ord('s'):  # Statistics
                 self.show_statistics()
         
+        self.cache.close()
+        cv2.destroyAllWindows()
+    
+    def load_review_status(self):
+        """Load grid review status (accepted/deleted/edit) per image"""
+        if self.review_path.exists():
+            try:
+                with open(self.review_path, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"Error reading review file {self.review_path}: {e}")
+        return {}
+    
+    def save_review_status(self, status):
+        """Save grid review status"""
+        with open(self.review_path, 'w') as f:
+            json.dump(status, f, indent=2, sort_keys=True)
+    
+    def make_tile(self, img_path, thumbs, cell_width, cell_height, status, selected):
+        """Render one grid cell: thumbnail, boxes, status border"""
+        tile = np.zeros((cell_height, cell_width, 3), dtype=np.uint8)
+        thumb = thumbs.get(img_path.stem)
+        
+        if thumb is not None:
+            scale = min((cell_width - 8) / thumb.shape[1], (cell_height - 24) / thumb.shape[0])
+            thumb_width = max(int(thumb.shape[1] * scale), 1)
+            thumb_height = max(int(thumb.shape[0] * scale), 1)
+            thumb = cv2.resize(thumb, (thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
+            
+            # Labels are normalized, so they map straight onto the thumbnail
+            thumb = self.draw_boxes(thumb, self.load_labels(img_path), thumb_width, thumb_height)
+            x0 = (cell_width - thumb_width) // 2
+            tile[4:4 + thumb_height, x0:x0 + thumb_width] = thumb
+        
+        cv2.putText(tile, img_path.stem, (4, cell_height - 6),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+        
+        if status in STATUS_COLORS:
+            cv2.rectangle(tile, (0, 0), (cell_width - 1, cell_height - 1), STATUS_COLORS[status], 3)
+            cv2.putText(tile, status, (cell_width - 70, cell_height - 6),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.4, STATUS_COLORS[status], 1)
+        if selected:
+            cv2.rectangle(tile, (1, 1), (cell_width - 2, cell_height - 2), (255, 255, 255), 1)
+        
+        return tile
+    
+    def run_grid(self, rows=4, cols=6, window_size=(1600, 900)):
+        """Contact-sheet review: rows x cols thumbnails per page"""
+        if not self.image_files:
+            return
+        
+        print("\nGrid controls:")
+        print("- Arrow keys or click: Select image")
+        print("- 'n' / 'p': Next / previous page")
+        print("- 'a': Accept labels")
+        print("- 'd': Delete label file (mark as no fish, moved to trash)")
+        print("- 'e': Mark as needing edits")
+        print("- 'u': Clear review mark (restores a deleted label file)")
+        print("- 'q' or ESC: Quit")
+        
+        build_thumbnails(self.image_files, self.thumbs_dir)
+        
+        # Smallest pyramid level that still fills a cell
+        cell_width, cell_height = window_size[0] // cols, window_size[1] // rows
+        level = THUMBNAIL_SIZES[0]
+        for size in THUMBNAIL_SIZES:
+            if size >= max(cell_width, cell_height):
+                level = size
+        level_dir = self.thumbs_dir / str(level)
+        
+        status = self.load_review_status()
+        per_page = rows * cols
+        selected = 0
+        thumbs = {}
+        dirty = True
+        
+        def on_mouse(event, x, y, flags, param):
+            nonlocal selected, dirty
+            if event == cv2.EVENT_LBUTTONDOWN:
+                idx = (selected // per_page) * per_page + (y // cell_height) * cols + x // cell_width
+                if idx < len(self.image_files):
+                    selected = idx
+                    dirty = True
+        
+        cv2.namedWindow("Label Grid")
+        cv2.setMouseCallback("Label Grid", on_mouse)
+        
+        while True:
+            page = selected // per_page
+            
+            # Redraw the sheet only after a key press or click
+            if dirty:
+                page_files = self.image_files[page * per_page:(page + 1) * per_page]
+                
+                # Only the current page's thumbnails are kept in memory
+                thumbs = {p.stem: thumbs[p.stem] if p.stem in thumbs else cv2.imread(str(level_dir / f"{p.stem}.jpg"))
+                          for p in page_files}
+                
+                sheet = np.zeros((rows * cell_height, cols * cell_width, 3), dtype=np.uint8)
+                for i, img_path in enumerate(page_files):
+                    r, c = divmod(i, cols)
+                    sheet[r * cell_height:(r + 1) * cell_height, c * cell_width:(c + 1) * cell_width] = \
+                        self.make_tile(img_path, thumbs, cell_width, cell_height,
+                                       status.get(img_path.name), page * per_page + i == selected)
+                
+                reviewed = sum(1 for p in self.image_files if p.name in status)
+                title = f"Page {page + 1}/{(len(self.image_files) - 1) // per_page + 1} - reviewed {reviewed}/{len(self.image_files)}"
+                cv2.setWindowTitle("Label Grid", title)
+                cv2.imshow("Label Grid", sheet)
+                dirty = False
+            
+            key = cv2.waitKey(50) & 0xFF
+            if key == 255:
+                continue
+            dirty = True
+            img_path = self.image_files[selected]
+            
+            if key == ord('q') or key == 27:
+                break
+            elif key == 83:  # right arrow
+                selected = min(selected + 1, len(self.image_files) - 1)
+            elif key == 81:  # left arrow
+                selected = max(selected - 1, 0)
+            elif key == 84:  # down arrow
+                selected = min(selected + cols, len(self.image_files) - 1)
+            elif key == 82:  # up arrow
+                selected = max(selected - cols, 0)
+            elif key == ord('n'):
+                selected = min((page + 1) * per_page, len(self.image_files) - 1)
+            elif key == ord('p'):
+                selected = max((page - 1) * per_page, 0)
+            elif key in (ord('a'), ord('d'), ord('e'), ord('u')):
+                # Any other mark (or 'u') undoes a delete
+                if status.get(img_path.name) == "deleted" and key != ord('d'):
+                    self.restore_label_file(img_path)
+                
+                if key == ord('a'):
+                    status[img_path.name] = "accepted"
+                elif key == ord('d'):
+                    self.trash_label_file(img_path)
+                    status[img_path.name] = "deleted"
+                elif key == ord('e'):
+                    status[img_path.name] = "edit"
+                else:
+                    status.pop(img_path.name, None)
+                self.save_review_status(status)
+                
+                # Advance so a page can be reviewed with one key per image
+                if key != ord('u'):
+                    selected = min(selected + 1, len(self.image_files) - 1)
+        
+        needs_edit = sorted(name for name, s in status.items() if s == "edit")
+        if needs_edit:
+            print(f"\n{len(needs_edit)} images need edits (open them in manual_labeler.py):")
+            for name in needs_edit:
+                print(f"  - {name}")
+        
+        self.cache.close()
         cv2.destroyAllWindows()
 
 def main():
@@ -193,8 +399,16 @@ def main():
         print(f"Labels directory not found: {labels_dir}")
         return
     
+    print("\nReview mode:")
+    print("1. One image at a time")
+    print("2. Thumbnail grid")
+    mode = input("Enter choice (1 or 2): ").strip()
+    
     viewer = LabelViewer(images_dir, labels_dir)
-    viewer.run()
+    if mode == "2":
+        viewer.run_grid()
+    else:
+        viewer.run()
 
 if __name__ == "__main__":
     main()
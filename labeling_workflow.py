@@ -51,11 +51,12 @@ def main():
     print("2. \u270F\uFE0F  Manual labeling (add/edit labels by hand)")
     print("3. \U0001F504 Re-run auto-labeling (if you improved the model)")
     print("4. \U0001F680 Train new model with current labels")
-    print("5. \U0001F4CA Show detailed statistics")
-    print("6. \u274C Exit")
+    print("5. \u23E9 Incremental update (fine-tune latest model, refresh uncertain labels)")
+    print("6. \U0001F4CA Show detailed statistics")
+    print("7. \u274C Exit")
     
     while True:
-        choice = input("\nEnter your choice (1-6): ").strip()
+        choice = input("\nEnter your choice (1-7): ").strip()
         
         if choice == "1":
             print("\nLaunching label viewer...")
@@ -64,6 +65,7 @@ def main():
             print("- Review auto-generated labels for accuracy")
             print("- Delete incorrect labels (press 'd')")
             print("- Navigate through your dataset")
+            print("- Pick the thumbnail grid mode to accept/delete/flag many images quickly")
             try:
                 subprocess.run([sys.executable, "label_viewer.py"], check=True)
             except subprocess.CalledProcessError:
@@ -110,6 +112,15 @@ def main():
                 print("Error during training")
                 
         elif choice == "5":
+            print("\nRunning incremental update...")
+            print("This fine-tunes the newest model only if enough labels changed,")
+            print("then re-labels just the images whose predictions were uncertain.")
+            try:
+                subprocess.run([sys.executable, "incremental.py"], check=True)
+            except subprocess.CalledProcessError:
+                print("Error during incremental update")
+                
+        elif choice == "6":
             count_labels()
             
             # Show detailed breakdown
@@ -135,12 +146,12 @@ def main():
                 print("2. Review the current labels with the label viewer")
                 print("3. Consider collecting more fish images")
                 
-        elif choice == "6":
+        elif choice == "7":
             print("\nGoodbye! \U0001F41F")
             break
             
         else:
-            print("Invalid choice. Please enter 1-6.")
+            print("Invalid choice. Please enter 1-7.")
 
 if __name__ == "__main__":
     main()
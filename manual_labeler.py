@@ -1,12 +1,15 @@
 import cv2
 import os
 from pathlib import Path
+from image_cache import ImageCache
+from yolo_labels import empty_labels, make_labels, read_labels, write_labels, xywhn_to_xyxy, xyxy_to_xywhn
 
 class ManualLabeler:
     def __init__(self, images_dir, labels_dir):
         self.images_dir = Path(images_dir)
         self.labels_dir = Path(labels_dir)
         self.current_idx = 0
+        self.cache = ImageCache()
         
         # Get list of images
         self.image_files = []
@@ -19,12 +22,23 @@ class ManualLabeler:
             
         self.image_files.sort()
         
-        # Drawing state
+        # Drawing state (boxes in image pixels, temp_box in display pixels)
         self.drawing = False
         self.start_point = None
         self.current_boxes = []
         self.temp_box = None
         
+        # Display state: base layer holds the image, committed boxes and text;
+        # frame is what gets shown and only differs by the rubber-band box
+        self.max_display_size = (1600, 900)
+        self.image_shape = None
+        self.display_scale = 1.0
+        self.display_source = None
+        self.base_image = None
+        self.frame = None
+        self.boxes_dirty = True
+        self.frame_dirty = True
+        
         os.makedirs(self.labels_dir, exist_ok=True)
         
         print(f"Found {len(self.image_files)} images")
@@ -37,27 +51,46 @@ class ManualLabeler:
         print("- 's': Save current labels")
         print("- 'q': Quit")
         
+    def to_image_coords(self, point):
+        """Map a display point back to image pixels"""
+        img_height, img_width = self.image_shape
+        x = min(max(int(round(point[0] / self.display_scale)), 0), img_width - 1)
+        y = min(max(int(round(point[1] / self.display_scale)), 0), img_height - 1)
+        return (x, y)
+    
+    def to_display_coords(self, point):
+        """Map an image point to display pixels"""
+        return (int(round(point[0] * self.display_scale)), int(round(point[1] * self.display_scale)))
+    
     def mouse_callback(self, event, x, y, flags, param):
         """Handle mouse events for drawing bounding boxes"""
+        if self.frame is None:
+            return
+        
+        # Clamp to the window, dragging outside it reports out-of-range points
+        x = min(max(x, 0), self.frame.shape[1] - 1)
+        y = min(max(y, 0), self.frame.shape[0] - 1)
+        
         if event == cv2.EVENT_LBUTTONDOWN:
             self.drawing = True
             self.start_point = (x, y)
             
         elif event == cv2.EVENT_MOUSEMOVE:
             if self.drawing:
-                self.temp_box = (self.start_point, (x, y))
+                self.draw_temp_box((self.start_point, (x, y)))
                 
         elif event == cv2.EVENT_LBUTTONUP:
             if self.drawing:
                 self.drawing = False
-                end_point = (x, y)
+                self.draw_temp_box(None)
+                start_point = self.to_image_coords(self.start_point)
+                end_point = self.to_image_coords((x, y))
                 
                 # Add box if it's large enough
-                if abs(end_point[0] - self.start_point[0]) > 10 and abs(end_point[1] - self.start_point[1]) > 10:
-                    self.current_boxes.append((self.start_point, end_point))
-                    print(f"Added box: {self.start_point} to {end_point}")
-                
-                self.temp_box = None
+                if abs(end_point[0] - start_point[0]) > 10 and abs(end_point[1] - start_point[1]) > 10:
+                    self.current_boxes.append((start_point, end_point))
+                    self.boxes_dirty = True
+                    print(f"Added box: {start_point} to {end_point}")
     
     def load_existing_labels(self, img_path):
         """Load existing labels for current image"""
@@ -66,79 +99,95 @@ class ManualLabeler:
         
         if label_path.exists():
             try:
-                # Load image to get dimensions
-                image = cv2.imread(str(img_path))
-                img_height, img_width = image.shape[:2]
+                # Dimensions come from the cache, no extra decode
+                img_width, img_height = self.cache.get_size(img_path)
                 
-                with open(label_path, 'r') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line:
-                            parts = line.split()
-                            if len(parts) >= 5:
-                                center_x = float(parts[1])
-                                center_y = float(parts[2])
-                                width = float(parts[3])
-                                height = float(parts[4])
-                                
-                                # Convert from YOLO format to pixel coordinates
-                                x1 = int((center_x - width/2) * img_width)
-                                y1 = int((center_y - height/2) * img_height)
-                                x2 = int((center_x + width/2) * img_width)
-                                y2 = int((center_y + height/2) * img_height)
-                                
-                                self.current_boxes.append(((x1, y1), (x2, y2)))
+                # Convert from YOLO format to pixel coordinates
+                labels = read_labels(label_path)
+                corners = xywhn_to_xyxy(labels[:, 1:], img_width, img_height).astype(int).tolist()
+                self.current_boxes = [((x1, y1), (x2, y2)) for x1, y1, x2, y2 in corners]
             except Exception as e:
                 print(f"Error loading labels: {e}")
     
     def save_labels(self, img_path):
         """Save current boxes to label file"""
+        label_path = self.labels_dir / f"{img_path.stem}.txt"
+        
         if not self.current_boxes:
-            # Create empty file
-            label_path = self.labels_dir / f"{img_path.stem}.txt"
-            label_path.touch()
+            # Empty file means no fish (truncates any previous labels)
+            write_labels(label_path, empty_labels())
             print("Saved empty label file")
             return
             
-        # Load image to get dimensions
-        image = cv2.imread(str(img_path))
-        img_height, img_width = image.shape[:2]
+        # Dimensions come from the cache, no extra decode
+        img_width, img_height = self.cache.get_size(img_path)
         
-        label_path = self.labels_dir / f"{img_path.stem}.txt"
-        
-        with open(label_path, 'w') as f:
-            for start_point, end_point in self.current_boxes:
-                # Convert to YOLO format
-                x1, y1 = start_point
-                x2, y2 = end_point
-                
-                # Ensure x1 < x2 and y1 < y2
-                x1, x2 = min(x1, x2), max(x1, x2)
-                y1, y2 = min(y1, y2), max(y1, y2)
-                
-                center_x = (x1 + x2) / 2 / img_width
-                center_y = (y1 + y2) / 2 / img_height
-                width = (x2 - x1) / img_width
-                height = (y2 - y1) / img_height
-                
-                # Class ID 0 for fish
-                f.write(f"0 {center_x:.6f} {center_y:.6f} {width:.6f} {height:.6f}\n")
+        # Convert to YOLO format, class ID 0 for fish
+        corners = [(x1, y1, x2, y2) for (x1, y1), (x2, y2) in self.current_boxes]
+        write_labels(label_path, make_labels(xyxy_to_xywhn(corners, img_width, img_height)))
         
         print(f"Saved {len(self.current_boxes)} labels to {label_path}")
     
-    def draw_boxes(self, image):
-        """Draw all bounding boxes on image"""
-        image_copy = image.copy()
+    def set_image(self, image):
+        """Prepare the (possibly downscaled) display copy of a new image"""
+        self.image_shape = image.shape[:2]
+        max_width, max_height = self.max_display_size
+        self.display_scale = min(1.0, max_width / image.shape[1], max_height / image.shape[0])
+        
+        if self.display_scale < 1.0:
+            display_size = (int(image.shape[1] * self.display_scale), int(image.shape[0] * self.display_scale))
+            self.display_source = cv2.resize(image, display_size, interpolation=cv2.INTER_AREA)
+        else:
+            self.display_source = image
+        
+        self.temp_box = None
+        self.drawing = False
+        self.boxes_dirty = True
+    
+    def draw_boxes(self, img_name):
+        """Rebuild the base layer with all committed boxes and info text"""
+        base_image = self.display_source.copy()
         
         # Draw saved boxes in green
         for start_point, end_point in self.current_boxes:
-            cv2.rectangle(image_copy, start_point, end_point, (0, 255, 0), 2)
+            cv2.rectangle(base_image, self.to_display_coords(start_point),
+                          self.to_display_coords(end_point), (0, 255, 0), 2)
         
-        # Draw temporary box in red
+        # Add info text
+        info_text = f"Image {self.current_idx + 1}/{len(self.image_files)}: {img_name}"
+        box_text = f"Boxes: {len(self.current_boxes)}"
+        
+        cv2.putText(base_image, info_text, (10, 25), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        cv2.putText(base_image, box_text, (10, 50), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        
+        self.base_image = base_image
+        self.frame = base_image.copy()
+        self.boxes_dirty = False
+        self.frame_dirty = True
+        
+        # Keep an in-progress drag visible across rebuilds
         if self.temp_box:
-            cv2.rectangle(image_copy, self.temp_box[0], self.temp_box[1], (0, 0, 255), 2)
+            temp_box, self.temp_box = self.temp_box, None
+            self.draw_temp_box(temp_box)
+    
+    def draw_temp_box(self, box):
+        """Replace the rubber-band box, touching only the pixels it covers"""
+        if self.temp_box:
+            # Restore the region under the previous box from the base layer
+            (x1, y1), (x2, y2) = self.temp_box
+            pad = 2
+            xa, xb = max(min(x1, x2) - pad, 0), max(x1, x2) + pad + 1
+            ya, yb = max(min(y1, y2) - pad, 0), max(y1, y2) + pad + 1
+            self.frame[ya:yb, xa:xb] = self.base_image[ya:yb, xa:xb]
+        
+        # Draw temporary box in red
+        if box:
+            cv2.rectangle(self.frame, box[0], box[1], (0, 0, 255), 2)
         
-        return image_copy
+        self.temp_box = box
+        self.frame_dirty = True
     
     def run(self):
         """Main labeling loop"""
@@ -151,34 +200,31 @@ class ManualLabeler:
         while self.current_idx < len(self.image_files):
             img_path = self.image_files[self.current_idx]
             
-            # Load image
-            image = cv2.imread(str(img_path))
+            # Load image (usually already prefetched)
+            image = self.cache.get(img_path)
             if image is None:
                 print(f"Could not load image: {img_path}")
                 self.current_idx += 1
                 continue
+            self.cache.prefetch_around(self.image_files, self.current_idx)
             
             # Load existing labels
             self.load_existing_labels(img_path)
+            self.set_image(image)
             
             while True:
-                # Draw image with boxes
-                display_image = self.draw_boxes(image)
-                
-                # Add info text
-                info_text = f"Image {self.current_idx + 1}/{len(self.image_files)}: {img_path.name}"
-                box_text = f"Boxes: {len(self.current_boxes)}"
-                
-                cv2.putText(display_image, info_text, (10, 25), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                cv2.putText(display_image, box_text, (10, 50), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                
-                cv2.imshow("Manual Labeler", display_image)
+                # Only redraw when boxes or the rubber-band box changed
+                if self.boxes_dirty:
+                    self.draw_boxes(img_path.name)
+                if self.frame_dirty:
+                    cv2.imshow("Manual Labeler", self.frame)
+                    self.frame_dirty = False
                 
-                key = cv2.waitKey(30) & 0xFF
+                key = cv2.waitKey(20) & 0xFF
                 
                 if key == ord('q'):
+                    self.cache.close()
+                    cv2.destroyAllWindows()
                     return
                 elif key == ord('n'):
                     self.save_labels(img_path)
@@ -191,13 +237,16 @@ class ManualLabeler:
                 elif key == ord('u'):  # Undo
                     if self.current_boxes:
                         self.current_boxes.pop()
+                        self.boxes_dirty = True
                         print("Removed last box")
                 elif key == ord('c'):  # Clear
                     self.current_boxes = []
+                    self.boxes_dirty = True
                     print("Cleared all boxes")
                 elif key == ord('s'):  # Save
                     self.save_labels(img_path)
         
+        self.cache.close()
         cv2.destroyAllWindows()
 
 def main():
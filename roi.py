@@ -0,0 +1,102 @@
+"""
+Region-of-interest crops and masks for fixed cameras
+
+A JSON config maps a video name, or a camera prefix of it, to a crop and
+the polygons where fish can be:
+
+    {
+      "default": {},
+      "cam3": {"crop": [0.1, 0.2, 0.9, 1.0]},
+      "task1vid1": {"polygons": [[[120, 80], [1800, 80], [1800, 1000], [120, 1000]]]}
+    }
+
+Coordinates are source-frame pixels, or fractions of the frame when every
+value is <= 1. Without a crop, the bounding box of the polygons is used.
+"""
+
+import json
+import os
+import cv2
+import numpy as np
+
+def load_roi_config(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def roi_entry_for(config, video_path):
+    """Config entry for a video: exact name, then longest camera prefix, then 'default'"""
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    if stem in config:
+        return config[stem]
+    prefixes = [key for key in config if key != 'default' and stem.startswith(key)]
+    if prefixes:
+        return config[max(prefixes, key=len)]
+    return config.get('default')
+
+def _to_pixels(points, width, height):
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    if points.size and points.max() <= 1.0:
+        points = points * np.array([width, height], dtype=np.float32)
+    return points
+
+class ROI:
+    """Crop box and fish mask for one camera at a given frame size"""
+    def __init__(self, width, height, crop=None, polygons=None):
+        polygons = [_to_pixels(p, width, height) for p in (polygons or [])]
+
+        if crop is not None:
+            (x1, y1), (x2, y2) = _to_pixels(crop, width, height)
+        elif polygons:
+            all_points = np.concatenate(polygons)
+            x1, y1 = all_points.min(axis=0)
+            x2, y2 = all_points.max(axis=0)
+        else:
+            x1, y1, x2, y2 = 0, 0, width, height
+
+        self.x1 = int(np.clip(np.floor(x1), 0, width - 1))
+        self.y1 = int(np.clip(np.floor(y1), 0, height - 1))
+        self.x2 = int(np.clip(np.ceil(x2), self.x1 + 1, width))
+        self.y2 = int(np.clip(np.ceil(y2), self.y1 + 1, height))
+        self.polygons = [np.round(p).astype(np.int32) for p in polygons]
+
+        # Mask in crop coordinates; 1 where fish can be
+        crop_h, crop_w = self.y2 - self.y1, self.x2 - self.x1
+        if self.polygons:
+            self.mask = np.zeros((crop_h, crop_w), dtype=np.uint8)
+            offset = np.array([self.x1, self.y1], dtype=np.int32)
+            cv2.fillPoly(self.mask, [p - offset for p in self.polygons], 1)
+        else:
+            self.mask = None
+
+    @classmethod
+    def from_config(cls, config, video_path, width, height):
+        """ROI for a video, or None when it has no entry"""
+        entry = roi_entry_for(config, video_path)
+        if not entry:
+            return None
+        return cls(width, height, crop=entry.get('crop'), polygons=entry.get('polygons'))
+
+    @property
+    def size(self):
+        return (self.x2 - self.x1, self.y2 - self.y1)
+
+    def crop(self, frame):
+        """View of the frame inside the crop box"""
+        return frame[self.y1:self.y2, self.x1:self.x2]
+
+    def filter(self, boxes):
+        """
+        Boolean keep-mask for (N, 4) xyxy boxes in crop pixels: a box is kept
+        when its center lies inside the mask
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        if self.mask is None:
+            return np.ones(len(boxes), dtype=bool)
+        cx = ((boxes[:, 0] + boxes[:, 2]) / 2).astype(np.int32).clip(0, self.mask.shape[1] - 1)
+        cy = ((boxes[:, 1] + boxes[:, 3]) / 2).astype(np.int32).clip(0, self.mask.shape[0] - 1)
+        return self.mask[cy, cx] > 0
+
+    def to_frame(self, boxes):
+        """Shift (N, 4) xyxy boxes from crop to frame pixels"""
+        return np.asarray(boxes, dtype=np.float32).reshape(-1, 4) + \
+            np.array([self.x1, self.y1, self.x1, self.y1], dtype=np.float32)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Parallel hyperparameter sweep for train.py on a single CPU host
+"""
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import train
+
+# Used when no --space file is given
+DEFAULT_SPACE = {
+    'lr0': [0.0005, 0.001, 0.002],
+    'batch': [8, 16],
+    'mosaic': [0.0, 0.5, 1.0],
+    'mixup': [0.0, 0.1],
+}
+
+METRIC = 'metrics/mAP50-95(B)'
+
+def trial_id(params):
+    """Stable id for a parameter set, used for resuming"""
+    key = json.dumps(params, sort_keys=True)
+    return 'trial_' + hashlib.sha1(key.encode()).hexdigest()[:8]
+
+def build_trials(space, max_trials=None, seed=0):
+    """Expand a {param: [values]} grid, optionally sampling max_trials of it"""
+    if 'imgsz' in space:
+        raise ValueError("imgsz can't be swept: all trials share one image cache")
+    fixed = {'epochs', 'cache', 'workers', 'weights'} & set(space)
+    if fixed:
+        raise ValueError(f"{', '.join(sorted(fixed))} are set by the sweep itself, use the command line options")
+
+    names = sorted(space)
+    trials = [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+    # Seeded so a resumed sweep picks the same trials
+    if max_trials and max_trials < len(trials):
+        trials = random.Random(seed).sample(trials, max_trials)
+    return trials
+
+def read_progress(progress_path):
+    """Latest metric per (trial, epoch) from all running and finished trials"""
+    progress = {}
+    if progress_path.exists():
+        with open(progress_path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # line being written by another trial
+                progress.setdefault(entry['epoch'], {})[entry['trial']] = entry['metric']
+    return progress
+
+class MedianPruner:
+    """
+    Stop a trial whose validation mAP falls below the median of the other
+    trials at the same epoch (after a warm-up). Trials share progress
+    through an append-only JSON-lines file, so this works across processes.
+    """
+    def __init__(self, name, progress_path, warmup_epochs=5, min_trials=3):
+        self.name = name
+        self.progress_path = Path(progress_path)
+        self.warmup_epochs = warmup_epochs
+        self.min_trials = min_trials
+        self.pruned_at = None
+
+    def __call__(self, trainer):
+        epoch = trainer.epoch + 1
+        metric = float(trainer.metrics.get(METRIC, 0.0))
+        with open(self.progress_path, 'a') as f:
+            f.write(json.dumps({'trial': self.name, 'epoch': epoch, 'metric': metric}) + '\n')
+
+        if epoch < self.warmup_epochs:
+            return
+        others = [m for t, m in read_progress(self.progress_path).get(epoch, {}).items() if t != self.name]
+        if len(others) >= self.min_trials and metric < statistics.median(others):
+            print(f"{self.name}: pruned at epoch {epoch} ({METRIC} {metric:.4f} < median {statistics.median(others):.4f})")
+            self.pruned_at = epoch
+            trainer.stop = True
+
+def _init_worker(threads):
+    """Give each trial process its share of the cores"""
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    os.environ['MKL_NUM_THREADS'] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+
+def run_trial(params, sweep_dir, epochs, threads, warmup_epochs, imgsz):
+    """Train one trial and return its summary row"""
+    name = trial_id(params)
+    pruner = MedianPruner(name, Path(sweep_dir) / 'progress.jsonl', warmup_epochs=warmup_epochs)
+
+    # Left over from an interrupted sweep: exist_ok would append to its results.csv
+    shutil.rmtree(Path(sweep_dir) / name, ignore_errors=True)
+
+    start = time.time()
+    save_dir = train.train(
+        cache='disk',
+        build_cache=False,  # the parent built it; rebuilding here would race other trials
+        workers=max(1, threads // 2),
+        imgsz=imgsz,
+        epochs=epochs,
+        callbacks={'on_fit_epoch_end': pruner},
+        project=str(sweep_dir),
+        name=name,
+        exist_ok=True,
+        save_period=-1,
+        plots=False,
+        **params,
+    )
+
+    # Best epoch of this trial from its results.csv
+    with open(Path(save_dir) / 'results.csv', 'r') as f:
+        rows = [{k.strip(): v for k, v in row.items()} for row in csv.DictReader(f)]
+    best = max(rows, key=lambda r: float(r[METRIC]))
+
+    return {
+        'trial': name,
+        **params,
+        'mAP50': round(float(best['metrics/mAP50(B)']), 4),
+        'mAP50-95': round(float(best[METRIC]), 4),
+        'best_epoch': int(float(best['epoch'])),
+        'epochs_run': len(rows),
+        'pruned': pruner.pruned_at is not None,
+        'minutes': round((time.time() - start) / 60, 1),
+        'weights': str(Path(save_dir) / 'weights' / 'best.pt'),
+    }
+
+def load_results(results_path):
+    """Finished trials from a previous (interrupted) sweep"""
+    if not results_path.exists():
+        return []
+    with open(results_path, 'r') as f:
+        return list(csv.DictReader(f))
+
+def save_results(results_path, results, param_names):
+    columns = ['trial'] + param_names + ['mAP50', 'mAP50-95', 'best_epoch', 'epochs_run', 'pruned', 'minutes', 'weights']
+    with open(results_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(sorted(results, key=lambda r: float(r['mAP50-95']), reverse=True))
+
+def print_table(results, param_names):
+    if not results:
+        print("\nNo finished trials")
+        return
+    columns = ['trial'] + param_names + ['mAP50', 'mAP50-95', 'epochs_run', 'pruned', 'minutes']
+    rows = sorted(results, key=lambda r: float(r['mAP50-95']), reverse=True)
+    widths = [max(len(c), *(len(str(r.get(c, ''))) for r in rows)) for c in columns]
+
+    print("\n" + "  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    print("  ".join('-' * w for w in widths))
+    for r in rows:
+        print("  ".join(str(r.get(c, '')).ljust(w) for c, w in zip(columns, widths)))
+
+def sweep(space, sweep_dir='runs/sweep', epochs=30, max_trials=None, parallel=None,
+          warmup_epochs=5, imgsz=640):
+    """Run every trial of the search space in a process pool, resuming finished ones"""
+    sweep_dir = Path(sweep_dir)
+    os.makedirs(sweep_dir, exist_ok=True)
+    results_path = sweep_dir / 'results.csv'
+
+    trials = build_trials(space, max_trials)
+    param_names = sorted(space)
+    results = load_results(results_path)
+    done = {r['trial'] for r in results}
+    pending = [p for p in trials if trial_id(p) not in done]
+
+    cores = os.cpu_count() or 1
+    parallel = parallel or max(1, cores // 4)
+    threads = max(1, cores // parallel)
+    print(f"Sweep: {len(trials)} trials, {len(done)} already done, "
+          f"{parallel} in parallel with {threads} threads each")
+
+    # Decode the dataset once; every trial reads the same .npy cache
+    train.cache_dataset(train.DATA_YAML, imgsz=imgsz)
+
+    if pending:
+        # spawn: each trial gets a fresh torch with its own thread count
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=parallel, mp_context=context,
+                                 initializer=_init_worker, initargs=(threads,)) as executor:
+            futures = {executor.submit(run_trial, params, sweep_dir, epochs, threads, warmup_epochs, imgsz): params
+                       for params in pending}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f"{trial_id(futures[future])} failed: {e}")
+                    continue
+                # Save after every trial so an interrupted sweep can resume
+                save_results(results_path, results, param_names)
+
+    print_table(results, param_names)
+    print(f"\nResults saved to: {results_path}")
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Hyperparameter sweep for the fish detector')
+    parser.add_argument('--space', type=str, help='JSON file with {param: [values]} (default: built-in grid)')
+    parser.add_argument('--sweep_dir', type=str, default='runs/sweep', help='Output folder, reuse it to resume')
+    parser.add_argument('--epochs', type=int, default=30, help='Epochs per trial')
+    parser.add_argument('--trials', type=int, help='Randomly sample this many trials from the grid')
+    parser.add_argument('--parallel', type=int, help='Trials run at once (default: cores / 4)')
+    parser.add_argument('--warmup', type=int, default=5, help='Epochs before a trial can be pruned')
+    parser.add_argument('--imgsz', type=int, default=640, help='Training image size')
+    args = parser.parse_args()
+
+    space = DEFAULT_SPACE
+    if args.space:
+        with open(args.space, 'r') as f:
+            space = json.load(f)
+
+    sweep(space, sweep_dir=args.sweep_dir, epochs=args.epochs, max_trials=args.trials,
+          parallel=args.parallel, warmup_epochs=args.warmup, imgsz=args.imgsz)
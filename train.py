@@ -1,13 +1,150 @@
+import argparse
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import cv2
+import numpy as np
+import yaml
+from PIL import Image
 from ultralytics import YOLO
 
-def train():
-    model = YOLO('yolov8s.pt')  # Pretrained YOLOv8 nano model
-    
+DATA_YAML = 'data/dataset.yaml'
+IMAGE_EXTS = ['*.jpg', '*.jpeg', '*.png', '*.bmp']
+
+def find_latest_weights(runs_dir='runs/detect'):
+    """Newest best.pt under runs_dir, or None"""
+    def run_number(path):
+        digits = ''.join(c for c in path.parent.parent.name if c.isdigit())
+        return int(digits) if digits else 0
+
+    # mtime first; the run number breaks ties (e.g. fresh git checkouts)
+    candidates = list(Path(runs_dir).glob('*/weights/best.pt'))
+    if not candidates:
+        return None
+    return str(max(candidates, key=lambda p: (p.stat().st_mtime, run_number(p))))
+
+def default_workers():
+    """Dataloader workers for CPU-only training"""
+    # With pre-decoded images the workers only augment, so leave at least
+    # half the cores to torch for the forward/backward pass
+    return max(1, min(8, (os.cpu_count() or 2) // 2))
+
+def dataset_image_dirs(data_yaml=DATA_YAML):
+    """Resolve the train/val image folders of a dataset yaml"""
+    with open(data_yaml, 'r') as f:
+        data = yaml.safe_load(f)
+
+    # 'path' may point at another machine, fall back to the yaml's folder
+    root = Path(data.get('path') or Path(data_yaml).parent)
+    if not root.exists():
+        root = Path(data_yaml).parent
+
+    dirs = []
+    for split in ('train', 'val'):
+        if data.get(split):
+            dirs.append(root / data[split])
+    return dirs
+
+def _cache_image(img_path, imgsz):
+    """Decode one image, shrink its long side to imgsz and save it as .npy"""
+    npy_path = img_path.with_suffix('.npy')
+    if npy_path.exists() and npy_path.stat().st_mtime >= img_path.stat().st_mtime:
+        # Memory-map just to read the header and verify the cached size
+        cached = np.load(npy_path, mmap_mode='r')
+        # Images are never upscaled, so small ones are cached at full size;
+        # PIL only reads the header to get that size
+        with Image.open(img_path) as img:
+            expected = min(imgsz, max(img.size))
+        if cached.dtype == np.uint8 and cached.ndim == 3 and max(cached.shape[:2]) == expected:
+            return 0
+
+    image = cv2.imread(str(img_path))
+    if image is None:
+        print(f"  Warning: Could not load {img_path}")
+        return 0
+
+    scale = imgsz / max(image.shape[:2])
+    if scale < 1:
+        new_size = (max(round(image.shape[1] * scale), 1), max(round(image.shape[0] * scale), 1))
+        image = cv2.resize(image, new_size, interpolation=cv2.INTER_AREA)
+
+    # Write then rename so an interrupted run never leaves a truncated cache;
+    # the pid keeps concurrent processes from sharing a temp file
+    tmp_path = npy_path.with_name(f"{npy_path.stem}.{os.getpid()}.tmp.npy")
+    np.save(tmp_path, np.ascontiguousarray(image))
+    os.replace(tmp_path, npy_path)
+    return 1
+
+def cache_dataset(data_yaml=DATA_YAML, imgsz=640, workers=None):
+    """
+    Pre-decode every dataset image once into Ultralytics' disk cache layout
+    (<image>.npy next to each image), already resized to imgsz.
+
+    Training with cache='disk' then loads these arrays instead of decoding
+    and resizing JPEGs every epoch. Labels are normalized, so the smaller
+    cached images need no label changes; letterboxing still happens in the
+    Ultralytics transforms.
+    """
+    image_files = []
+    for images_dir in dataset_image_dirs(data_yaml):
+        for ext in IMAGE_EXTS:
+            image_files.extend(images_dir.glob(ext))
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        written = sum(executor.map(lambda p: _cache_image(p, imgsz), image_files))
+
+    # Verify: every image must now have a readable cache entry
+    missing = [p for p in image_files if not p.with_suffix('.npy').exists()]
+    print(f"Image cache: {len(image_files) - len(missing)}/{len(image_files)} images cached "
+          f"({written} updated in {time.time() - start:.1f}s)")
+    if missing:
+        print(f"  Warning: {len(missing)} images could not be cached and will be decoded each epoch")
+    return len(missing) == 0
+
+def clear_cache(data_yaml=DATA_YAML):
+    """Remove pre-decoded .npy images"""
+    removed = 0
+    for images_dir in dataset_image_dirs(data_yaml):
+        for npy_path in images_dir.glob('*.npy'):
+            npy_path.unlink()
+            removed += 1
+    if removed:
+        print(f"Image cache: removed {removed} cached images")
+
+def epoch_time(save_dir):
+    """Mean seconds per epoch from a run's results.csv"""
+    with open(Path(save_dir) / 'results.csv', 'r') as f:
+        header = [h.strip() for h in f.readline().split(',')]
+        times = [float(line.split(',')[header.index('time')]) for line in f if line.strip()]
+
+    # 'time' is cumulative; skip the first epoch when possible (warm-up)
+    if len(times) > 1:
+        return (times[-1] - times[0]) / (len(times) - 1)
+    return times[0] if times else float('nan')
+
+def train(cache='disk', workers=None, imgsz=640, epochs=200, weights='yolov8s.pt', callbacks=None,
+          build_cache=True, **overrides):
+    model = YOLO(weights)  # Pretrained YOLOv8 small model by default
+    for event, callback in (callbacks or {}).items():
+        model.add_callback(event, callback)
+
+    # Ultralytics loads <image>.npy whenever it exists, whatever the cache
+    # setting: 'no cache' has to remove them to really decode JPEGs, and
+    # 'ram' has to refresh them so it never loads ones shrunk for a smaller imgsz.
+    # build_cache=False leaves the .npy files to whoever already built them
+    if cache and build_cache:
+        cache_dataset(DATA_YAML, imgsz=imgsz)
+    elif not cache:
+        clear_cache(DATA_YAML)
+
     # Train with better parameters for small dataset
-    model.train(
-        data='data/dataset.yaml', 
-        epochs=200,  # More epochs for small dataset
-        imgsz=640, 
+    args = dict(
+        data=DATA_YAML,
+        epochs=epochs,  # More epochs for small dataset
+        imgsz=imgsz,
         batch=8,     # Smaller batch for small dataset
         lr0=0.001,   # Lower learning rate
         patience=20, # Early stopping patience
@@ -15,8 +152,49 @@ def train():
         augment=True,    # Enable data augmentation
         mosaic=0.5,      # Mosaic augmentation
         mixup=0.1,       # Mixup augmentation
-        copy_paste=0.1   # Copy-paste augmentation
+        copy_paste=0.1,  # Copy-paste augmentation
+        cache=cache or False,  # 'disk' reuses the pre-decoded .npy images
+        workers=workers if workers is not None else default_workers(),
     )
+    args.update(overrides)
+    model.train(**args)
+    return model.trainer.save_dir
+
+def benchmark_cache(epochs=3, workers=None, imgsz=640):
+    """Report epoch time with and without the image cache"""
+    results = {}
+    for cache in (False, 'disk'):
+        name = f"cache_{cache or 'off'}"
+        # exist_ok appends to an old results.csv, which would skew epoch_time
+        shutil.rmtree(Path('runs/benchmark') / name, ignore_errors=True)
+        save_dir = train(cache=cache, workers=workers, imgsz=imgsz, epochs=epochs,
+                         project='runs/benchmark', name=name, exist_ok=True,
+                         save_period=-1, plots=False)
+        results[name] = epoch_time(save_dir)
+
+    print(f"\nEpoch time over {epochs} epochs (workers={workers if workers is not None else default_workers()}):")
+    for name, seconds in results.items():
+        print(f"- {name}: {seconds:.1f}s")
+    print(f"- speedup: {results['cache_off'] / results['cache_disk']:.2f}x")
 
 if __name__ == '__main__':
-    train()
+    parser = argparse.ArgumentParser(description='Train the fish detector')
+    parser.add_argument('--cache', choices=['disk', 'ram', 'none'], default='disk',
+                        help="Image cache: 'disk' pre-decodes images to .npy once (default), "
+                             "'ram' also keeps them in memory, 'none' removes the .npy files and decodes JPEGs every epoch")
+    parser.add_argument('--workers', type=int, default=None,
+                        help=f'Dataloader workers (default for this machine: {default_workers()})')
+    parser.add_argument('--imgsz', type=int, default=640, help='Training image size')
+    parser.add_argument('--epochs', type=int, default=200, help='Number of epochs')
+    parser.add_argument('--cache_only', action='store_true', help='Only build the image cache, do not train')
+    parser.add_argument('--benchmark', type=int, metavar='EPOCHS',
+                        help='Train EPOCHS epochs with and without the cache and report epoch time')
+    args = parser.parse_args()
+
+    if args.cache_only:
+        cache_dataset(DATA_YAML, imgsz=args.imgsz, workers=args.workers)
+    elif args.benchmark:
+        benchmark_cache(epochs=args.benchmark, workers=args.workers, imgsz=args.imgsz)
+    else:
+        train(cache=None if args.cache == 'none' else args.cache, workers=args.workers,
+              imgsz=args.imgsz, epochs=args.epochs)
@@ -0,0 +1,134 @@
+import csv
+import os
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+
+# codec name -> (fourcc, file extension)
+CODECS = {
+    'mp4v': ('mp4v', '.mp4'),
+    'avc1': ('avc1', '.mp4'),  # H.264, smallest files if OpenCV has an encoder for it
+    'xvid': ('XVID', '.avi'),
+    'mjpg': ('MJPG', '.avi'),  # intra-only: fastest to encode, largest files
+}
+
+class AsyncVideoWriter:
+    """
+    cv2.VideoWriter that encodes on a background thread.
+
+    Frames are handed over through a bounded queue, so detection keeps
+    running while the previous frames are encoded. Frames must not be
+    modified after write().
+    """
+    def __init__(self, path, fps, size, codec='mp4v', quality=None, queue_size=64):
+        fourcc, _ = CODECS[codec]
+        self.path = path
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+        if not self.writer.isOpened() and codec != 'mp4v':
+            print(f"⚠️ Codec {codec} not available, falling back to mp4v")
+            self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+        if not self.writer.isOpened():
+            raise IOError(f"Could not open video writer for {path}")
+
+        # Only some backends/codecs honour this (e.g. MJPG), others ignore it
+        if quality is not None:
+            self.writer.set(cv2.VIDEOWRITER_PROP_QUALITY, quality)
+
+        self.frames_written = 0
+        self.encode_time = 0.0   # seconds spent encoding on the worker
+        self.blocked_time = 0.0  # seconds the caller waited on a full queue
+        self._error = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            if self._error is not None:
+                continue  # drain the queue so write() never blocks forever
+            try:
+                start = time.perf_counter()
+                self.writer.write(frame)
+                self.encode_time += time.perf_counter() - start
+                self.frames_written += 1
+            except Exception as e:
+                self._error = e
+
+    def write(self, frame):
+        if self._error is not None:
+            raise self._error
+        start = time.perf_counter()
+        self._queue.put(frame)
+        self.blocked_time += time.perf_counter() - start
+
+    def release(self):
+        """Flush pending frames and close the file"""
+        self._queue.put(None)
+        self._thread.join()
+        self.writer.release()
+        if self._error is not None:
+            raise self._error
+
+class FrameSelector:
+    """
+    Decide which frames go into the output video.
+
+    all:        every frame
+    changed:    skip frames that barely differ from the last written one,
+                unless the detection count changed (fish arriving/leaving)
+    detections: only frames with detections (highlight reel)
+
+    Written frames are recorded in a timestamp index so a reduced video can
+    be mapped back to source frames and times.
+    """
+    def __init__(self, mode='all', fps=30.0, diff_threshold=2.0):
+        self.mode = mode
+        self.fps = fps or 30.0
+        self.diff_threshold = diff_threshold
+        self.index = []  # (output_frame, source_frame, time_s, detections)
+        self.skipped = 0
+        self._last_thumb = None
+        self._last_detections = None
+
+    def _thumb(self, frame):
+        # Tiny grayscale copy: cheap to compare, robust to sensor noise
+        small = cv2.resize(frame, (64, 64), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+    def keep(self, frame, frame_idx, detections):
+        """Return True if the frame should be written"""
+        if self.mode == 'detections':
+            keep = detections > 0
+        elif self.mode == 'changed':
+            thumb = self._thumb(frame)
+            keep = (self._last_thumb is None or detections != self._last_detections
+                    or np.abs(thumb - self._last_thumb).mean() >= self.diff_threshold)
+            if keep:
+                self._last_thumb = thumb
+                self._last_detections = detections
+        else:
+            keep = True
+
+        if keep:
+            self.index.append((len(self.index), frame_idx, round(frame_idx / self.fps, 3), detections))
+        else:
+            self.skipped += 1
+        return keep
+
+    def save_index(self, path):
+        """Write the output-frame -> source-frame/time index as CSV"""
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['output_frame', 'source_frame', 'time_s', 'detections'])
+            writer.writerows(self.index)
+
+def output_path_for(video_path, output_dir, codec='mp4v', suffix='_output'):
+    """outputs/<video>_output.<ext> with the extension the codec needs"""
+    _, ext = CODECS[codec]
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(output_dir, f"{stem}{suffix}{ext}")
@@ -0,0 +1,235 @@
+"""
+Vectorized YOLO label I/O and box conversion shared by all labeling tools.
+
+Labels are (N, 5) float32 arrays of [class_id, center_x, center_y, width, height]
+with normalized coordinates, exactly as stored in the .txt files.
+"""
+
+import os
+from pathlib import Path
+import numpy as np
+
+LABEL_FORMAT = "%d %.6f %.6f %.6f %.6f"
+
+def empty_labels():
+    """Return an empty (0, 5) label array"""
+    return np.zeros((0, 5), dtype=np.float32)
+
+# Byte values that separate tokens, as a lookup table for np.frombuffer
+_WHITESPACE = np.zeros(256, dtype=bool)
+_WHITESPACE[[9, 10, 11, 12, 13, 32]] = True
+
+def _tokens_per_line(buf):
+    """Token count of every line of buf (bytes ending in a newline), vectorized"""
+    chars = np.frombuffer(buf, dtype=np.uint8)
+    space = _WHITESPACE[chars]
+    starts = np.flatnonzero(~space & np.concatenate(([True], space[:-1])))
+    newlines = np.flatnonzero(chars == 10)
+    # Line of a token = number of newlines before it
+    return np.bincount(np.searchsorted(newlines, starts), minlength=len(newlines))
+
+def _parse_values(buf, rows):
+    """Parse buf (str or bytes) holding exactly rows 5-column lines with one NumPy call"""
+    values = np.fromstring(buf, dtype=np.float32, sep=' ')
+    if values.size != rows * 5:
+        raise ValueError("could not convert every value to float")
+    return values.reshape(-1, 5)
+
+def parse_labels(text):
+    """Parse the contents of a YOLO label file into an (N, 5) array"""
+    rows = [parts for parts in (line.split() for line in text.splitlines()) if parts]
+    if not rows:
+        return empty_labels()
+
+    # Fast path: every non-blank line has exactly 5 columns, NumPy parses the floats
+    if all(len(parts) == 5 for parts in rows):
+        return _parse_values(text, len(rows))
+
+    # Mixed rows (extra columns or short lines): keep the first 5 columns
+    rows = [parts[:5] for parts in rows if len(parts) >= 5]
+    if not rows:
+        return empty_labels()
+    return np.array(rows, dtype=np.float32)
+
+def read_labels(label_path):
+    """Read one label file; a missing file means no labels"""
+    label_path = Path(label_path)
+    if not label_path.exists():
+        return empty_labels()
+    with open(label_path, 'r') as f:
+        return parse_labels(f.read())
+
+def read_split_labels(labels_dir, stems=None):
+    """
+    Load every label file of a split in a single pass.
+
+    Returns a dict stem -> (N, 5) array. The files are joined into one
+    buffer, column counts are checked per line with NumPy and all values
+    are parsed with one NumPy call, then split into per-file views. Pass
+    stems to also get empty arrays for images without a label file.
+    """
+    labels_dir = Path(labels_dir)
+    if stems is None:
+        stems = sorted(p.stem for p in labels_dir.glob("*.txt"))
+
+    # Plain string paths: pathlib's per-file overhead rivals the parsing here
+    labels_root = str(labels_dir)
+    datas = []
+    for stem in stems:
+        try:
+            with open(os.path.join(labels_root, f"{stem}.txt"), 'rb') as f:
+                datas.append(f.read())
+        except FileNotFoundError:
+            datas.append(b"")
+
+    # Column count of every line of every file at once; files with a line
+    # that isn't 5 columns (or blank) go through parse_labels instead
+    buf = b"\n".join(datas) + b"\n"
+    counts = _tokens_per_line(buf)
+    file_of_line = np.repeat(np.arange(len(stems)), [data.count(b"\n") + 1 for data in datas])
+    bad = np.bincount(file_of_line[(counts != 0) & (counts != 5)], minlength=len(stems)) > 0
+    box_counts = np.bincount(file_of_line[counts == 5], minlength=len(stems))
+    if bad.any():
+        box_counts[bad] = 0
+        buf = b"\n".join(data for data, b in zip(datas, bad) if not b) + b"\n"
+
+    try:
+        all_labels = _parse_values(buf, int(box_counts.sum()))
+    except ValueError:
+        # A non-numeric value somewhere: parse file by file to isolate it
+        return {stem: _parse_or_empty(labels_dir / f"{stem}.txt", data) for stem, data in zip(stems, datas)}
+
+    offsets = np.concatenate(([0], np.cumsum(box_counts)))
+    labels = {stem: all_labels[offsets[i]:offsets[i + 1]] for i, stem in enumerate(stems)}
+    for i in np.flatnonzero(bad):
+        labels[stems[i]] = _parse_or_empty(labels_dir / f"{stems[i]}.txt", datas[i])
+    return labels
+
+def _parse_or_empty(label_path, data):
+    """parse_labels on raw file bytes, but a corrupt file is reported and treated as empty"""
+    try:
+        return parse_labels(data.decode())
+    except ValueError as e:
+        print(f"Error reading labels from {label_path}: {e}")
+        return empty_labels()
+
+def format_labels(labels):
+    """Format an (N, 5) label array as label file contents"""
+    labels = np.asarray(labels, dtype=np.float64).reshape(-1, 5)
+    if len(labels) == 0:
+        return ""
+    return "\n".join(LABEL_FORMAT % tuple(row) for row in labels) + "\n"
+
+def write_labels(label_path, labels):
+    """Write an (N, 5) label array; no labels writes an empty file"""
+    label_path = Path(label_path)
+    os.makedirs(label_path.parent, exist_ok=True)
+    with open(label_path, 'w') as f:
+        f.write(format_labels(labels))
+
+def xyxy_to_xywhn(boxes, img_width, img_height):
+    """Convert (N, 4) pixel [x1, y1, x2, y2] boxes to normalized [cx, cy, w, h]"""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+
+    # Corners may come in any order (e.g. boxes dragged up-left)
+    x1 = np.minimum(boxes[:, 0], boxes[:, 2])
+    x2 = np.maximum(boxes[:, 0], boxes[:, 2])
+    y1 = np.minimum(boxes[:, 1], boxes[:, 3])
+    y2 = np.maximum(boxes[:, 1], boxes[:, 3])
+
+    return np.stack([
+        (x1 + x2) / 2 / img_width,
+        (y1 + y2) / 2 / img_height,
+        (x2 - x1) / img_width,
+        (y2 - y1) / img_height,
+    ], axis=1)
+
+def xywhn_to_xyxy(boxes, img_width, img_height):
+    """Convert (N, 4) normalized [cx, cy, w, h] boxes to pixel [x1, y1, x2, y2]"""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    half_w = boxes[:, 2] / 2
+    half_h = boxes[:, 3] / 2
+
+    return np.stack([
+        (boxes[:, 0] - half_w) * img_width,
+        (boxes[:, 1] - half_h) * img_height,
+        (boxes[:, 0] + half_w) * img_width,
+        (boxes[:, 1] + half_h) * img_height,
+    ], axis=1)
+
+def make_labels(boxes_xywhn, class_ids=0):
+    """Stack class ids and normalized boxes into an (N, 5) label array"""
+    boxes_xywhn = np.asarray(boxes_xywhn, dtype=np.float32).reshape(-1, 4)
+    class_ids = np.broadcast_to(np.asarray(class_ids, dtype=np.float32), (len(boxes_xywhn),))
+    return np.column_stack([class_ids, boxes_xywhn]).astype(np.float32)
+
+def benchmark(num_files=2000, boxes_per_file=20):
+    """Compare per-line float() parsing with the vectorized loaders"""
+    import tempfile
+    import time
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        stems = [f"frame_{i:05d}" for i in range(num_files)]
+        for stem in stems:
+            write_labels(Path(tmp) / f"{stem}.txt", make_labels(rng.random((boxes_per_file, 4))))
+
+        # The per-box loop every tool used before
+        start = time.perf_counter()
+        loop_labels = {}
+        for stem in stems:
+            labels = []
+            with open(Path(tmp) / f"{stem}.txt", 'r') as f:
+                for line in f:
+                    parts = line.strip().split()
+                    if len(parts) >= 5:
+                        labels.append([int(parts[0])] + [float(p) for p in parts[1:5]])
+            loop_labels[stem] = labels
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        per_file = {stem: read_labels(Path(tmp) / f"{stem}.txt") for stem in stems}
+        per_file_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        split = read_split_labels(tmp, stems)
+        split_time = time.perf_counter() - start
+
+        # Parsing alone, without the per-file open/read both sides share
+        text = "".join(format_labels(split[stem]) for stem in stems)
+        start = time.perf_counter()
+        [[int(parts[0])] + [float(p) for p in parts[1:5]] for parts in (line.split() for line in text.splitlines())]
+        parse_loop_time = time.perf_counter() - start
+        buf = text.encode()
+        start = time.perf_counter()
+        counts = _tokens_per_line(buf)
+        assert np.all(counts == 5)
+        _parse_values(buf, len(counts))
+        parse_time = time.perf_counter() - start
+
+        # Box conversion over every box at once vs one box at a time
+        all_boxes = np.concatenate(list(split.values()))[:, 1:]
+        start = time.perf_counter()
+        for cx, cy, w, h in all_boxes.tolist():
+            (int((cx - w / 2) * 1920), int((cy - h / 2) * 1080), int((cx + w / 2) * 1920), int((cy + h / 2) * 1080))
+        convert_loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        xywhn_to_xyxy(all_boxes, 1920, 1080).astype(int)
+        convert_time = time.perf_counter() - start
+
+    assert all(len(per_file[s]) == len(split[s]) == len(loop_labels[s]) for s in stems)
+    total = num_files * boxes_per_file
+    print(f"Parsed {num_files} files / {total} boxes:")
+    print(f"- per-line float() loop: {loop_time * 1000:8.1f} ms")
+    print(f"- read_labels per file:  {per_file_time * 1000:8.1f} ms ({loop_time / per_file_time:.1f}x)")
+    print(f"- read_split_labels:     {split_time * 1000:8.1f} ms ({loop_time / split_time:.1f}x)")
+    print(f"Parsing only (text already in memory):")
+    print(f"- per-line float() loop: {parse_loop_time * 1000:8.1f} ms")
+    print(f"- column check + NumPy:  {parse_time * 1000:8.1f} ms ({parse_loop_time / parse_time:.1f}x)")
+    print(f"Converted {total} boxes xywhn -> xyxy:")
+    print(f"- per-box loop:          {convert_loop_time * 1000:8.1f} ms")
+    print(f"- xywhn_to_xyxy:         {convert_time * 1000:8.1f} ms ({convert_loop_time / convert_time:.1f}x)")
+
+if __name__ == "__main__":
+    benchmark()